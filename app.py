@@ -1,89 +1,324 @@
 import asyncio
+import logging
 import os
-from datetime import timedelta
-from typing import Optional, List
-
+import re
+import sys
+import tempfile
+import threading
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timedelta
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from typing import Optional, List, Dict, Tuple
+
+import orjson
 import uvicorn
+from cachetools import TTLCache
 from dotenv import load_dotenv
 from fastapi import FastAPI, Depends, HTTPException, Request, Form, Query
-from fastapi.responses import HTMLResponse, RedirectResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, ORJSONResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import func, inspect, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.orm import Session, selectinload
+
+# 加载 .env 文件；需在导入本地模块之前，auth、models 在模块加载时读取环境变量
+load_dotenv()
 
-from auth import get_current_admin, create_access_token, authenticate_admin, ACCESS_TOKEN_EXPIRE_MINUTES, hash_password
+from auth import get_current_admin, create_access_token, authenticate_admin, ACCESS_TOKEN_EXPIRE_MINUTES, hash_password, \
+    invalidate_token
 from database import SessionLocal, engine, get_db
-from llm_service import generate_repo_summary
-from models import Base, Category, Repository, Admin, Config
+from llm_service import (
+    generate_repo_summary, generate_repo_summaries_with_batch, resume_repo_summaries_batch, is_batch_enabled,
+    BATCH_MIN_SIZE,
+    clear_config_cache, get_http_client, close_http_client
+)
+from models import Base, Category, Repository, Admin, Config, BatchJob, GITHUB_URL_MAX_LENGTH
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl，单进程运行无需加锁
+    fcntl = None
+
+# LLM 摘要队列容量与并行 worker 数量；队列与 worker 在 lifespan 中创建（需要事件循环）
+LLM_QUEUE_MAXSIZE = 1000
+LLM_CONCURRENCY = max(1, int(os.getenv("LLM_CONCURRENCY", "4")))
+
+# 一次性初始化使用的锁文件，放在系统临时目录，不写入代码目录或挂载卷
+INIT_LOCK_FILE = os.path.join(tempfile.gettempdir(), "github_navigator.init.lock")
+
+# 当前进程标识：认领仓库时写入 processing_owner，并定期刷新心跳；
+# 心跳超过 PROCESSING_STALE_AFTER 未更新的认领视为所属进程已退出
+PROCESS_TOKEN = uuid.uuid4().hex
+PROCESSING_HEARTBEAT_INTERVAL = 60
+PROCESSING_STALE_AFTER = timedelta(seconds=PROCESSING_HEARTBEAT_INTERVAL * 3)
+
+# 仓库列表总数短期缓存：键为 (category_id, 搜索条件)，仓库或分类变更时清空
+_count_cache: TTLCache = TTLCache(maxsize=256, ttl=30)
+# 站点地图缓存：键为 base_url，内容为渲染好的 XML 字节，每小时重新生成
+_sitemap_cache: TTLCache = TTLCache(maxsize=8, ttl=3600)
+# 接口在线程池中执行，TTLCache 本身不是线程安全的
+_cache_lock = threading.Lock()
+
+
+async def _do_llm_summary(repository_id: int, github_url: str, refresh: bool = False):
+    """执行单个仓库的 LLM 摘要生成
+
+    等待 LLM 期间不持有数据库会话；写回摘要在线程池中短暂使用连接。refresh 为 True 时不使用缓存
+    """
+    try:
+        print(f"开始处理仓库 {repository_id} 的LLM摘要")
 
-# 全局变量：记录正在进行LLM摘要处理的仓库ID集合
-processing_repositories = set()
+        result = await generate_repo_summary(github_url, refresh=refresh)
 
-# 全局队列 + worker：替代 asyncio.Lock 避免大量协程堆积拖慢事件循环
-llm_task_queue: asyncio.Queue = None  # 在 startup 事件中初始化（需要事件循环）
-llm_worker_task: asyncio.Task = None
+        if not result.get("success"):
+            print(f"仓库 {repository_id} LLM摘要生成失败: {result.get('error')}")
+            return
 
+        # 写回在线程池中执行，不阻塞事件循环
+        if await run_in_threadpool(_save_summary, repository_id, result.get("summary", github_url)):
+            print(f"成功为仓库 {repository_id} 更新LLM摘要")
+    except Exception as e:
+        print(f"后台任务更新仓库 {repository_id} 摘要时出错: {e}")
 
-async def _do_llm_summary(repository_id: int, github_url: str):
-    """执行单个仓库的 LLM 摘要生成"""
-    db = SessionLocal()
-    try:
-        print(f"开始处理仓库 {repository_id} 的LLM摘要")
 
-        result = await generate_repo_summary(github_url, db)
+def _save_summary(repository_id: int, summary: str) -> bool:
+    """将摘要写回仓库描述，仓库不存在（已被删除）时返回 False"""
+    with SessionLocal() as db:
+        updated = db.query(Repository).filter(Repository.id == repository_id).update(
+            {Repository.description: summary},
+            synchronize_session=False
+        )
+        db.commit()
+    if updated:
+        clear_count_cache()
+    return bool(updated)
+
+
+async def _do_llm_summary_batch(repositories: List[Tuple[int, str]], batch_id: Optional[str] = None,
+                                refresh: bool = False):
+    """通过 OpenAI Batch API 为一批仓库生成摘要，结束后统一重置处理状态
 
-        if result.get("success"):
-            repo = db.query(Repository).filter(Repository.id == repository_id).first()
-            if repo:
-                repo.description = result.get("summary", github_url)
-                db.commit()
-                print(f"成功为仓库 {repository_id} 更新LLM摘要")
+    传入 batch_id 时继续轮询已提交的任务（提交它的进程已退出），不重新提交；refresh 为 True 时不使用缓存
+    """
+    repository_ids = [repository_id for repository_id, _ in repositories]
+    try:
+        if batch_id:
+            results = await resume_repo_summaries_batch(batch_id)
         else:
-            print(f"仓库 {repository_id} LLM摘要生成失败: {result.get('error')}")
+            results = await generate_repo_summaries_with_batch(
+                [github_url for _, github_url in repositories], refresh=refresh, job_owner=PROCESS_TOKEN
+            )
+        summaries = {}
+        for repository_id, github_url in repositories:
+            result = results.get(github_url) or {}
+            if not result.get("success"):
+                print(f"仓库 {repository_id} LLM摘要生成失败: {result.get('error')}")
+                continue
+            summaries[repository_id] = result["summary"]
+        updated = await run_in_threadpool(_save_summaries, summaries)
+        print(f"Batch 摘要完成，成功更新 {updated}/{len(repositories)} 个仓库")
     except Exception as e:
-        print(f"后台任务更新仓库 {repository_id} 摘要时出错: {e}")
-        if db:
-            db.rollback()
+        print(f"Batch 摘要任务出错: {e}")
     finally:
-        if db:
-            db.close()
+        try:
+            await run_in_threadpool(_set_processing, repository_ids, False)
+        except Exception as e:
+            print(f"重置仓库处理状态失败: {e}")
+
+
+def _save_summaries(summaries: Dict[int, str]) -> int:
+    """在同一事务中批量写回摘要，返回实际更新的仓库数"""
+    if not summaries:
+        return 0
+    updated = 0
+    with SessionLocal() as db:
+        for repository_id, summary in summaries.items():
+            updated += db.query(Repository).filter(Repository.id == repository_id).update(
+                {Repository.description: summary},
+                synchronize_session=False
+            )
+        db.commit()
+    clear_count_cache()
+    return updated
 
 
-async def _llm_worker():
-    """单个常驻 worker，从队列逐个取任务执行，不会产生协程堆积"""
+def _set_processing(repository_ids: List[int], processing: bool):
+    """更新仓库的 LLM 处理状态"""
+    with SessionLocal() as db:
+        db.query(Repository).filter(Repository.id.in_(repository_ids)).update(
+            {Repository.is_processing: processing},
+            synchronize_session=False
+        )
+        db.commit()
+
+
+async def _llm_worker(queue: asyncio.Queue):
+    """常驻 worker，从队列逐个取任务执行，不会产生协程堆积"""
     while True:
-        repository_id, github_url = await llm_task_queue.get()
+        repository_id, github_url, refresh = await queue.get()
         try:
-            await _do_llm_summary(repository_id, github_url)
+            await _do_llm_summary(repository_id, github_url, refresh)
         except Exception as e:
             print(f"LLM worker 异常: {e}")
         finally:
-            processing_repositories.discard(repository_id)
-            llm_task_queue.task_done()
+            try:
+                await run_in_threadpool(_set_processing, [repository_id], False)
+            except Exception as e:
+                print(f"重置仓库 {repository_id} 处理状态失败: {e}")
+            queue.task_done()
+
+
+def claim_for_llm_summary(db: Session, repository_ids: List[int],
+                          allow_batch: bool = False) -> Tuple[List[Tuple[int, str]], bool]:
+    """认领待生成摘要的仓库，返回 ([(仓库ID, github_url)], 是否整批交给 Batch API)
+
+    同步数据库操作，异步接口中需经 run_in_threadpool 调用；
+    通过数据库中的 is_processing 标记去重，多进程部署下状态也一致。
+    allow_batch 为 True、已开启 Batch API 且数量达到 BATCH_MIN_SIZE 时，整批交给一个 Batch 任务处理。
+    """
+    if not repository_ids:
+        return [], False
+
+    # 只认领尚未处理中的仓库，UPDATE ... RETURNING 保证认领是原子的
+    claimed = db.execute(
+        update(Repository)
+        .where(Repository.id.in_(repository_ids), Repository.is_processing.is_(False))
+        .values(is_processing=True, processing_owner=PROCESS_TOKEN, processing_heartbeat=func.now())
+        .returning(Repository.id, Repository.github_url)
+    ).all()
+    db.commit()
+
+    use_batch = allow_batch and len(claimed) >= BATCH_MIN_SIZE and is_batch_enabled(db)
+    return [(row.id, row.github_url) for row in claimed], use_batch
+
+
+async def enqueue_llm_summary(claimed: List[Tuple[int, str]], use_batch: bool = False,
+                              refresh: bool = False) -> Tuple[List[int], List[int]]:
+    """将已认领的仓库入队，返回 (已入队的仓库ID, 因队列已满未入队的仓库ID)
+
+    asyncio.Queue 与 create_task 不是线程安全的，必须在事件循环中调用；队列已满时撤销认领标记。
+    refresh 为 True 时（管理员指定仓库重新生成）跳过仓库内容与摘要缓存。
+    """
+    if use_batch:
+        _start_batch_task(claimed, refresh=refresh)
+        return [repository_id for repository_id, _ in claimed], []
+
+    queue: asyncio.Queue = app.state.llm_queue
+    queued, rejected = [], []
+    for repository_id, github_url in claimed:
+        try:
+            queue.put_nowait((repository_id, github_url, refresh))
+            queued.append(repository_id)
+        except asyncio.QueueFull:
+            rejected.append(repository_id)
+    if rejected:
+        await run_in_threadpool(_set_processing, rejected, False)
+    return queued, rejected
+
+
+def _start_batch_task(repositories: List[Tuple[int, str]], batch_id: Optional[str] = None, refresh: bool = False):
+    """在后台执行 Batch 摘要任务，必须在事件循环中调用"""
+    task = asyncio.create_task(_do_llm_summary_batch(repositories, batch_id, refresh))
+    # 保留任务引用，防止被垃圾回收；退出时统一取消
+    app.state.batch_tasks.add(task)
+    task.add_done_callback(app.state.batch_tasks.discard)
+
+
+def claim_batch_jobs() -> List[Tuple[str, List[Tuple[int, str]]]]:
+    """认领无人轮询（认领已释放或心跳过期）的 Batch 任务及其中尚未处理中的仓库
+
+    返回 [(batch_id, [(仓库ID, github_url)])]；同步数据库操作，需经 run_in_threadpool 调用
+    """
+    with SessionLocal() as db:
+        jobs = db.execute(
+            update(BatchJob)
+            .where((BatchJob.processing_heartbeat.is_(None))
+                   | (BatchJob.processing_heartbeat < datetime.utcnow() - PROCESSING_STALE_AFTER))
+            .values(processing_owner=PROCESS_TOKEN, processing_heartbeat=func.now())
+            .returning(BatchJob.batch_id, BatchJob.url_keys)
+        ).all()
+        claimed = []
+        for batch_id, url_keys in jobs:
+            repositories = db.execute(
+                update(Repository)
+                .where(Repository.github_url.in_(list(orjson.loads(url_keys))), Repository.is_processing.is_(False))
+                .values(is_processing=True, processing_owner=PROCESS_TOKEN, processing_heartbeat=func.now())
+                .returning(Repository.id, Repository.github_url)
+            ).all()
+            claimed.append((batch_id, [(row.id, row.github_url) for row in repositories]))
+        db.commit()
+    return claimed
+
+
+async def resume_batch_jobs():
+    """接管无人轮询的 Batch 任务，继续等待结果而不是重新提交"""
+    for batch_id, repositories in await run_in_threadpool(claim_batch_jobs):
+        print(f"继续 Batch 摘要任务 {batch_id}，涉及 {len(repositories)} 个仓库")
+        _start_batch_task(repositories, batch_id)
+
+
+def clear_count_cache():
+    """仓库或分类变更后清空列表总数缓存"""
+    with _cache_lock:
+        _count_cache.clear()
+
+
+def paginate_repositories(query, page: int, page_size: int, cache_key: tuple):
+    """分页查询仓库，返回 (items, total, has_more)
+
+    多取一条记录判断 has_more；当前页能确定已到末尾时直接推算总数，
+    否则读取按 cache_key 短期缓存的总数，避免每次都执行 count()。
+    """
+    offset = (page - 1) * page_size
+    items = query.offset(offset).limit(page_size + 1).all()
+    has_more = len(items) > page_size
+    items = items[:page_size]
+
+    if not has_more and (items or page == 1):
+        total = offset + len(items)
+        with _cache_lock:
+            _count_cache[cache_key] = total
+        return items, total, has_more
+
+    with _cache_lock:
+        total = _count_cache.get(cache_key)
+    if total is None:
+        total = query.order_by(None).count()
+        with _cache_lock:
+            _count_cache[cache_key] = total
+    return items, total, has_more
 
 
-def enqueue_llm_summary(repository_id: int, github_url: str):
-    """将 LLM 摘要任务入队（去重），不创建额外协程"""
-    if repository_id not in processing_repositories:
-        processing_repositories.add(repository_id)
-        llm_task_queue.put_nowait((repository_id, github_url))
+def load_category_map(db: Session) -> dict:
+    """一次性加载全部分类（表很小），返回 {id: (name, parent_id, level)}"""
+    rows = db.query(Category.id, Category.name, Category.parent_id, Category.level).all()
+    return {row.id: (row.name, row.parent_id, row.level) for row in rows}
 
 
 # 仓库对象转换公共函数
-def repository_to_dict(repo: Repository) -> dict:
-    """将Repository对象转换为字典"""
+def repository_to_dict(repo: Repository, category_map: dict) -> dict:
+    """将Repository对象转换为字典，分类信息从 load_category_map 的结果中读取，不再逐级懒加载"""
     # 构建分类路径（从根分类到当前分类）
     category_path = []
-    if repo.category:
-        current_category = repo.category
-        while current_category:
-            category_path.insert(0, {
-                "id": current_category.id,
-                "name": current_category.name,
-                "level": current_category.level
-            })
-            current_category = current_category.parent
+    category_id = repo.category_id
+    while category_id in category_map:
+        name, parent_id, level = category_map[category_id]
+        category_path.insert(0, {
+            "id": category_id,
+            "name": name,
+            "level": level
+        })
+        category_id = parent_id
 
     return {
         "id": repo.id,
@@ -92,20 +327,75 @@ def repository_to_dict(repo: Repository) -> dict:
         "repo_name": repo.repo_name,
         "github_url": repo.github_url,
         "category_id": repo.category_id,
-        "category_name": repo.category.name if repo.category else None,
+        "category_name": category_path[-1]["name"] if category_path else None,
         "category_path": category_path,  # 完整的分类路径
         "card_url": repo.card_url,
         "description": repo.description,
-        "is_processing": repo.id in processing_repositories
+        "is_processing": bool(repo.is_processing)
     }
 
 
-# 加载 .env 文件
-load_dotenv()
+def ensure_schema():
+    """创建缺失的表；create_all 不会为已存在的表补建列和索引，这里逐个补齐"""
+    Base.metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def start_logging() -> Tuple[QueueHandler, QueueListener]:
+    """日志经 QueueHandler 放入队列，由 QueueListener 的后台线程写到标准输出，事件循环线程不做阻塞 I/O"""
+    log_queue = SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    listener = QueueListener(log_queue, stream_handler)
+    queue_handler = QueueHandler(log_queue)
+    logging.getLogger().addHandler(queue_handler)
+    logging.getLogger("llm_service").setLevel(logging.INFO)
+    listener.start()
+    return queue_handler, listener
+
+
+def stop_logging(queue_handler: QueueHandler, listener: QueueListener):
+    """移除队列日志处理器，并在写完队列中剩余的日志后停止后台线程"""
+    logging.getLogger().removeHandler(queue_handler)
+    listener.stop()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """启动与停止日志线程、LLM 摘要队列、worker、处理中心跳、Batch 任务及共享的 HTTP 客户端"""
+    queue_handler, listener = start_logging()
+    get_http_client()
+    app.state.llm_queue = asyncio.Queue(maxsize=LLM_QUEUE_MAXSIZE)
+    app.state.batch_tasks = set()
+    workers = [asyncio.create_task(_llm_worker(app.state.llm_queue)) for _ in range(LLM_CONCURRENCY)]
+    workers.append(asyncio.create_task(_processing_heartbeat()))
+    try:
+        await resume_batch_jobs()
+    except Exception as e:
+        print(f"继续 Batch 摘要任务失败: {e}")
+    try:
+        yield
+    finally:
+        tasks = workers + list(app.state.batch_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await close_http_client()
+        stop_logging(queue_handler, listener)
 
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="GitHub Project Navigator")
+# JSON 接口统一使用 orjson 序列化；大列表接口直接返回 ORJSONResponse，跳过 jsonable_encoder 的逐层遍历
+app = FastAPI(title="GitHub Project Navigator", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 
 def init_default_admin():
@@ -133,32 +423,90 @@ def init_default_admin():
         db.close()
 
 
-# 启动时初始化默认管理员
-init_default_admin()
+def reset_processing_flags():
+    """清理已退出进程遗留的处理中标记（进程退出时其队列中的任务已丢失）
+
+    只重置心跳过期的认领，其他仍在运行的 worker 进程正在处理的任务不受影响，避免重复入队
+    """
+    db = SessionLocal()
+    try:
+        db.query(Repository).filter(
+            Repository.is_processing.is_(True),
+            (Repository.processing_heartbeat.is_(None))
+            | (Repository.processing_heartbeat < datetime.utcnow() - PROCESSING_STALE_AFTER)
+        ).update(
+            {Repository.is_processing: False},
+            synchronize_session=False
+        )
+        db.commit()
+    except Exception as e:
+        print(f"重置处理中标记失败: {e}")
+        db.rollback()
+    finally:
+        db.close()
 
 
-@app.on_event("startup")
-async def startup_llm_worker():
-    """启动 LLM 摘要 worker"""
-    global llm_task_queue, llm_worker_task
-    llm_task_queue = asyncio.Queue()
-    llm_worker_task = asyncio.create_task(_llm_worker())
+def refresh_processing_heartbeat():
+    """刷新当前进程所认领仓库及 Batch 任务的心跳"""
+    with SessionLocal() as db:
+        db.query(Repository).filter(
+            Repository.is_processing.is_(True),
+            Repository.processing_owner == PROCESS_TOKEN
+        ).update(
+            {Repository.processing_heartbeat: func.now()},
+            synchronize_session=False
+        )
+        db.query(BatchJob).filter(BatchJob.processing_owner == PROCESS_TOKEN).update(
+            {BatchJob.processing_heartbeat: func.now()},
+            synchronize_session=False
+        )
+        db.commit()
 
 
-@app.on_event("shutdown")
-async def shutdown_llm_worker():
-    """优雅停止 LLM 摘要 worker"""
-    global llm_worker_task
-    if llm_worker_task:
-        llm_worker_task.cancel()
+async def _processing_heartbeat():
+    """定期刷新本进程认领的心跳，回收其他已退出进程遗留的标记，并接管无人轮询的 Batch 任务"""
+    while True:
+        await asyncio.sleep(PROCESSING_HEARTBEAT_INTERVAL)
         try:
-            await llm_worker_task
-        except asyncio.CancelledError:
-            pass
+            await run_in_threadpool(refresh_processing_heartbeat)
+            await run_in_threadpool(reset_processing_flags)
+            await resume_batch_jobs()
+        except Exception as e:
+            print(f"刷新处理中心跳失败: {e}")
+
+
+@contextmanager
+def init_lock():
+    """文件锁：多 worker 进程同时启动时串行执行一次性初始化"""
+    with open(INIT_LOCK_FILE, "w") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# 启动时建表并初始化默认管理员
+with init_lock():
+    ensure_schema()
+    init_default_admin()
+    reset_processing_flags()
 
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
+# 生产环境关闭模板自动重载（避免每次渲染都 stat 模板文件），并缓存编译后的字节码；DEBUG 模式下保留自动重载
+templates = Jinja2Templates(
+    directory="templates",
+    auto_reload=os.getenv("DEBUG", "").lower() in ("1", "true", "yes"),
+    cache_size=400,
+    bytecode_cache=FileSystemBytecodeCache()
+)
+
+# 预编译页面模板，避免首个请求承担编译开销
+for _template_name in ("repositories.html", "admin_login.html", "admin_dashboard.html", "admin_configs.html"):
+    templates.get_template(_template_name)
 
 
 # 获取 base URL 函数
@@ -194,6 +542,20 @@ def get_full_url(request: Request) -> str:
 templates.env.globals['get_full_url'] = get_full_url
 
 
+# GitHub 仓库地址：[http(s)://][www.]github.com/<owner>/<repo>，协议可省略（与管理后台批量添加的校验一致），允许末尾的 .git 或 /
+GITHUB_URL_RE = re.compile(r"^(?:https?://)?(?:www\.)?github\.com/([^/\s?#]+)/([^/\s?#]+?)(?:\.git)?/?$", re.IGNORECASE)
+
+
+def parse_github_url(github_url: str) -> tuple:
+    """解析GitHub URL，返回 (owner, repo_name)"""
+    if len(github_url) > GITHUB_URL_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail="GitHub URL 过长")
+    match = GITHUB_URL_RE.match(github_url.strip())
+    if not match:
+        raise HTTPException(status_code=400, detail="无效的GitHub URL")
+    return match.group(1), match.group(2)
+
+
 class CategoryCreate(BaseModel):
     name: str
     parent_id: Optional[int] = None
@@ -216,8 +578,8 @@ class RepositoryCreate(BaseModel):
 
 
 @app.post("/api/categories")
-async def create_category(category: CategoryCreate, current_admin: Admin = Depends(get_current_admin),
-                          db: Session = Depends(get_db)):
+def create_category(category: CategoryCreate, current_admin: Admin = Depends(get_current_admin),
+                    db: Session = Depends(get_db)):
     level = 0
     if category.parent_id:
         parent = db.query(Category).filter(Category.id == category.parent_id).first()
@@ -241,93 +603,97 @@ async def create_category(category: CategoryCreate, current_admin: Admin = Depen
             "level": db_category.level}
 
 
+def group_categories_by_parent(db: Session) -> dict:
+    """一次查询全部分类并预加载仓库，返回 {parent_id: [子分类]}，构建分类树时不再触发懒加载"""
+    categories = db.query(Category).options(selectinload(Category.repositories)).all()
+    by_parent = defaultdict(list)
+    for category in categories:
+        by_parent[category.parent_id].append(category)
+    return by_parent
+
+
 @app.get("/api/categories")
-async def get_categories(db: Session = Depends(get_db)):
-    categories = db.query(Category).all()
-    result = []
+def get_categories(db: Session = Depends(get_db)):
+    by_parent = group_categories_by_parent(db)
 
     def build_category_tree(category):
         repos = [{"name": repo.name} for repo in category.repositories]
 
-        children = [build_category_tree(child) for child in category.children]
+        children = [build_category_tree(child) for child in by_parent.get(category.id, [])]
 
         return {
             "id": category.id,
             "name": category.name,
             "repositories": repos,
-            "repo_count": len(category.repositories or []),
-            "child_count": len(category.children or []),
+            "repo_count": len(repos),
+            "child_count": len(children),
             "children": children
         }
 
-    for category in categories:
-        if category.parent_id is None:
-            result.append(build_category_tree(category))
-
-    return result
+    return ORJSONResponse([build_category_tree(category) for category in by_parent.get(None, [])])
 
 
 @app.get("/api/categories/public")
-async def get_categories_public(db: Session = Depends(get_db)):
+def get_categories_public(db: Session = Depends(get_db)):
     """首页分类筛选专用接口：只显示有仓库的分类，每个分类只统计自己的仓库数量"""
-    categories = db.query(Category).all()
+    by_parent = group_categories_by_parent(db)
     result = []
 
+    # 会话的标识映射保证每个分类 id 只对应一个对象，因此按对象缓存即按分类 id 缓存
+    @lru_cache(maxsize=None)
     def has_repositories_in_tree(category):
         """检查分类或其子分类是否有仓库"""
-        if category.repositories and len(category.repositories) > 0:
+        if category.repositories:
             return True
-        for child in category.children:
-            if has_repositories_in_tree(child):
-                return True
-        return False
+        return any(has_repositories_in_tree(child) for child in by_parent.get(category.id, []))
 
     def build_category_tree(category):
         # 只统计当前分类自己的仓库数量，不包括子分类
         repos = [{"name": repo.name} for repo in category.repositories]
 
-        # 递归构建子分类树，但只保留有仓库的子分类
-        children = []
-        for child in category.children:
-            # 只有当子分类有仓库时才包含（注意：这里检查的是子分类自己，不是树）
-            if child.repositories and len(child.repositories) > 0:
-                child_node = build_category_tree(child)
-                if child_node:
-                    children.append(child_node)
-            # 如果子分类没有仓库，但它的子孙分类有仓库，也要保留以维持树形结构
-            elif has_repositories_in_tree(child):
-                child_node = build_category_tree(child)
-                if child_node:
-                    children.append(child_node)
+        # 递归构建子分类树，只保留自己或子孙分类有仓库的子分类，以维持树形结构
+        children = [
+            build_category_tree(child)
+            for child in by_parent.get(category.id, [])
+            if has_repositories_in_tree(child)
+        ]
 
         return {
             "id": category.id,
             "name": category.name,
             "repositories": repos,
-            "repo_count": len(category.repositories or []),  # 只统计自己的仓库
+            "repo_count": len(repos),  # 只统计自己的仓库
             "child_count": len(children),
             "children": children
         }
 
-    for category in categories:
-        if category.parent_id is None:
-            # 顶级分类：只有自己有仓库，或子孙分类有仓库时才包含
-            if has_repositories_in_tree(category):
-                tree = build_category_tree(category)
-                if tree:
-                    result.append(tree)
+    for category in by_parent.get(None, []):
+        # 顶级分类：只有自己有仓库，或子孙分类有仓库时才包含
+        if has_repositories_in_tree(category):
+            result.append(build_category_tree(category))
 
-    return result
+    return ORJSONResponse(result)
 
 
 @app.get("/api/categories/flat")
-async def get_categories_flat(db: Session = Depends(get_db)):
+def get_categories_flat(db: Session = Depends(get_db)):
     categories = db.query(Category).all()
     return [{"id": cat.id, "name": cat.name, "parent_id": cat.parent_id, "level": cat.level} for cat in categories]
 
 
+# 递归查询某分类的全部子孙分类及其相对深度（直接子分类深度为 1）
+DESCENDANTS_SQL = text("""
+    WITH RECURSIVE descendants(id, depth) AS (
+        SELECT id, 1 FROM categories WHERE parent_id = :root
+        UNION ALL
+        SELECT c.id, d.depth + 1 FROM categories c JOIN descendants d ON c.parent_id = d.id
+    )
+    SELECT id, depth FROM descendants
+""")
+
+
 @app.put("/api/categories/{category_id}")
-async def update_category(
+def update_category(
         category_id: int,
         category_update: CategoryCreate,
         current_admin: Admin = Depends(get_current_admin),
@@ -348,16 +714,11 @@ async def update_category(
         if category_update.parent_id == category_id:
             raise HTTPException(status_code=400, detail="不能选择自己作为父级")
 
+        # 一次递归查询取出全部子孙分类及其相对深度
+        descendants = db.execute(DESCENDANTS_SQL, {"root": category_id}).all()
+        descendant_ids = [row.id for row in descendants]
+
         # 检查是否选择了自己的子孙分类作为父级
-        def get_descendant_ids(parent_id):
-            descendants = []
-            children = db.query(Category).filter(Category.parent_id == parent_id).all()
-            for child in children:
-                descendants.append(child.id)
-                descendants.extend(get_descendant_ids(child.id))
-            return descendants
-
-        descendant_ids = get_descendant_ids(category_id)
         if category_update.parent_id in descendant_ids:
             raise HTTPException(status_code=400, detail="不能选择自己的子分类作为父级")
 
@@ -372,20 +733,8 @@ async def update_category(
             if new_level > 2:
                 raise HTTPException(status_code=400, detail="最多只能创建三级分类")
 
-            # 检查移动后子孙分类是否会超过三级
-            def check_descendants_max_depth(parent_id, current_depth=0):
-                """检查子孙分类的最大深度"""
-                children = db.query(Category).filter(Category.parent_id == parent_id).all()
-                if not children:
-                    return current_depth
-                max_depth = current_depth
-                for child in children:
-                    child_depth = check_descendants_max_depth(child.id, current_depth + 1)
-                    max_depth = max(max_depth, child_depth)
-                return max_depth
-
-            # 如果当前分类有子分类，检查移动后整体深度
-            max_descendant_depth = check_descendants_max_depth(category_id)
+            # 如果当前分类有子分类，检查移动后整体深度是否会超过三级
+            max_descendant_depth = max((row.depth for row in descendants), default=0)
             if new_level + max_descendant_depth > 2:
                 raise HTTPException(status_code=400, detail=f"移动后子分类将超过三级限制")
         else:
@@ -396,22 +745,21 @@ async def update_category(
         category.parent_id = category_update.parent_id
         category.level = new_level
 
-        # 递归更新所有子孙分类的level
-        def update_descendants_level(parent_id, level_diff):
-            children = db.query(Category).filter(Category.parent_id == parent_id).all()
-            for child in children:
-                child.level += level_diff
-                update_descendants_level(child.id, level_diff)
-
+        # 批量更新所有子孙分类的level
         level_diff = new_level - old_level
-        if level_diff != 0:
-            update_descendants_level(category_id, level_diff)
+        if level_diff != 0 and descendant_ids:
+            db.query(Category).filter(Category.id.in_(descendant_ids)).update(
+                {Category.level: Category.level + level_diff},
+                synchronize_session=False
+            )
 
     # 更新名称
     category.name = category_update.name.strip()
 
     db.commit()
     db.refresh(category)
+    # 分类名称参与仓库搜索，需清空总数缓存
+    clear_count_cache()
 
     return {
         "id": category.id,
@@ -422,18 +770,18 @@ async def update_category(
 
 
 @app.delete("/api/categories/{category_id}")
-async def delete_category(category_id: int, current_admin: Admin = Depends(get_current_admin),
-                          db: Session = Depends(get_db)):
+def delete_category(category_id: int, current_admin: Admin = Depends(get_current_admin),
+                    db: Session = Depends(get_db)):
     category = db.query(Category).filter(Category.id == category_id).first()
     if not category:
         raise HTTPException(status_code=404, detail="分类不存在")
 
-    # 检查是否有子分类
-    if category.children:
+    # 检查是否有子分类；只需判断是否存在，取一行 id 即可，不必加载整个集合
+    if db.query(Category.id).filter(Category.parent_id == category_id).first():
         raise HTTPException(status_code=400, detail="该分类下还有子分类，无法删除")
 
     # 检查是否有仓库
-    if category.repositories:
+    if db.query(Repository.id).filter(Repository.category_id == category_id).first():
         raise HTTPException(status_code=400, detail="该分类下还有仓库，无法删除")
 
     db.delete(category)
@@ -441,8 +789,30 @@ async def delete_category(category_id: int, current_admin: Admin = Depends(get_c
     return {"message": "分类已删除"}
 
 
+# 只提取 access_token，不解析整个 Cookie 头
+ACCESS_TOKEN_COOKIE_RE = re.compile(r"(?:^|;)\s*access_token=([^;]*)")
+
+
+def get_access_token(request: Request) -> Optional[str]:
+    """从 Cookie 请求头中直接读取 access_token"""
+    cookie_header = request.headers.get("cookie")
+    if not cookie_header:
+        return None
+    match = ACCESS_TOKEN_COOKIE_RE.search(cookie_header)
+    if not match:
+        return None
+    return match.group(1).strip() or None
+
+
+def authenticate_token(token: Optional[str]) -> Admin:
+    """在短期会话中校验令牌，校验完即归还连接；供需要长时间等待外部接口的异步接口使用"""
+    with SessionLocal() as db:
+        return get_current_admin(token, db)
+
+
 def _is_admin_request(request: Request, db: Session) -> bool:
-    token = request.cookies.get("access_token")
+    """判断当前请求是否来自已登录的管理员；get_current_admin 按令牌缓存结果，有效和无效令牌都不会重复解码"""
+    token = get_access_token(request)
     if not token:
         return False
     try:
@@ -453,7 +823,7 @@ def _is_admin_request(request: Request, db: Session) -> bool:
 
 
 @app.get("/", response_class=HTMLResponse)
-async def home(request: Request, category_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
+def home(request: Request, category_id: Optional[int] = Query(None), db: Session = Depends(get_db)):
     # 首页显示仓库列表，使用前端无限滚动加载，这里只返回空的初始页面
     categories = db.query(Category).filter(Category.parent_id.is_(None)).all()
 
@@ -475,47 +845,16 @@ async def home(request: Request, category_id: Optional[int] = Query(None), db: S
 
 
 @app.get("/sitemap.xml")
-async def sitemap(request: Request, db: Session = Depends(get_db)):
-    """生成站点地图，包含首页和所有有仓库的分类页面"""
-    from datetime import datetime
-
+def sitemap(request: Request, db: Session = Depends(get_db)):
+    """生成站点地图，包含首页和所有有仓库的分类页面；渲染结果按 base_url 缓存一小时"""
     base_url = get_base_url(request)
 
-    # 获取所有有仓库的分类ID
-    categories_with_repos = db.query(Category).filter(
-        Category.repositories.any()
-    ).all()
-
-    # 构建 XML
-    xml_lines = [
-        '<?xml version="1.0" encoding="UTF-8"?>',
-        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
-    ]
-
-    # 添加首页
-    xml_lines.extend([
-        '  <url>',
-        f'    <loc>{base_url}/</loc>',
-        f'    <lastmod>{datetime.now().strftime("%Y-%m-%d")}</lastmod>',
-        '    <changefreq>daily</changefreq>',
-        '    <priority>1.0</priority>',
-        '  </url>'
-    ])
-
-    # 添加所有有仓库的分类页面
-    for category in categories_with_repos:
-        xml_lines.extend([
-            '  <url>',
-            f'    <loc>{base_url}/?category_id={category.id}</loc>',
-            f'    <lastmod>{datetime.now().strftime("%Y-%m-%d")}</lastmod>',
-            '    <changefreq>weekly</changefreq>',
-            '    <priority>0.8</priority>',
-            '  </url>'
-        ])
-
-    xml_lines.append('</urlset>')
-
-    xml_content = '\n'.join(xml_lines)
+    with _cache_lock:
+        xml_content = _sitemap_cache.get(base_url)
+    if xml_content is None:
+        xml_content = build_sitemap(base_url, db)
+        with _cache_lock:
+            _sitemap_cache[base_url] = xml_content
 
     return Response(
         content=xml_content,
@@ -524,8 +863,36 @@ async def sitemap(request: Request, db: Session = Depends(get_db)):
     )
 
 
+def build_sitemap(base_url: str, db: Session) -> bytes:
+    """渲染站点地图 XML，直接在字节缓冲区中拼接，避免大量中间字符串"""
+    # 获取所有有仓库的分类ID
+    category_ids = db.query(Category.id).filter(Category.repositories.any()).all()
+    today = datetime.now().strftime("%Y-%m-%d").encode()
+    base = base_url.encode()
+
+    buf = bytearray(b'<?xml version="1.0" encoding="UTF-8"?>\n'
+                    b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+
+    # 添加首页
+    buf += b'  <url>\n    <loc>' + base + b'/</loc>\n    <lastmod>' + today + b'</lastmod>\n' \
+           b'    <changefreq>daily</changefreq>\n    <priority>1.0</priority>\n  </url>\n'
+
+    # 添加所有有仓库的分类页面，每个条目只有分类ID不同，前后缀预先拼好
+    entry_prefix = b'  <url>\n    <loc>' + base + b'/?category_id='
+    entry_suffix = b'</loc>\n    <lastmod>' + today + b'</lastmod>\n' \
+                   b'    <changefreq>weekly</changefreq>\n    <priority>0.8</priority>\n  </url>\n'
+    for (category_id,) in category_ids:
+        buf += entry_prefix
+        buf += str(category_id).encode()
+        buf += entry_suffix
+
+    buf += b'</urlset>'
+
+    return bytes(buf)
+
+
 @app.get("/api/repositories")
-async def list_repositories(
+def list_repositories(
         q: Optional[str] = Query(None),
         category_id: Optional[int] = Query(None),
         page: int = Query(1, ge=1),
@@ -548,6 +915,7 @@ async def list_repositories(
         has_more: 是否还有更多数据
     """
     query = db.query(Repository)
+    like = None
 
     # 搜索筛选（支持模糊搜索仓库信息和分类名称）
     if q and q.strip():
@@ -565,22 +933,45 @@ async def list_repositories(
         query = query.filter(Repository.category_id == category_id)
 
     # 按最新入库时间排序
-    query = query.order_by(Repository.added_at.desc())
-
-    # 获取总数
-    total = query.count()
+    query = query.order_by(Repository.added_at.desc(), Repository.id.desc())
 
-    # 分页
-    offset = (page - 1) * page_size
-    repositories = query.offset(offset).limit(page_size).all()
+    # 分页并获取总数
+    repositories, total, has_more = paginate_repositories(query, page, page_size, (category_id, like))
+    category_map = load_category_map(db)
 
-    return {
-        "items": [repository_to_dict(r) for r in repositories],
+    return ORJSONResponse({
+        "items": [repository_to_dict(r, category_map) for r in repositories],
         "total": total,
         "page": page,
         "page_size": page_size,
-        "has_more": (page * page_size) < total
-    }
+        "has_more": has_more
+    })
+
+
+def insert_repository(db: Session, repository: RepositoryCreate, owner: str, repo_name: str) -> Repository:
+    """插入仓库；分类是否存在、URL是否重复由外键和唯一约束在插入时检查，省去两次预查询"""
+    db_repository = Repository(
+        name=repository.name,
+        github_url=repository.github_url,
+        owner=owner,
+        repo_name=repo_name,
+        category_id=repository.category_id,
+        description=repository.description.strip()
+    )
+    db.add(db_repository)
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        message = str(e.orig).lower()
+        if "github_url" in message:
+            raise HTTPException(status_code=400, detail="该仓库已存在")
+        if "foreign key" in message:
+            raise HTTPException(status_code=404, detail="分类不存在")
+        raise
+    db.refresh(db_repository)
+    clear_count_cache()
+    return db_repository
 
 
 @app.post("/api/repositories")
@@ -600,51 +991,27 @@ async def create_repository(
             repository.description = repository.github_url
 
     # 解析GitHub URL获取owner和repo_name
-    try:
-        if "github.com" in repository.github_url:
-            parts = repository.github_url.strip("/").split("/")
-            if len(parts) >= 2:
-                owner = parts[-2]
-                repo_name = parts[-1]
-            else:
-                raise HTTPException(status_code=400, detail="无效的GitHub URL")
-        else:
-            raise HTTPException(status_code=400, detail="请提供有效的GitHub URL")
-    except Exception:
-        raise HTTPException(status_code=400, detail="无效的GitHub URL格式")
+    owner, repo_name = parse_github_url(repository.github_url)
 
-    # 检查分类是否存在
-    category = db.query(Category).filter(Category.id == repository.category_id).first()
-    if not category:
-        raise HTTPException(status_code=404, detail="分类不存在")
+    # 数据库操作在线程池中执行，不阻塞事件循环
+    db_repository = await run_in_threadpool(insert_repository, db, repository, owner, repo_name)
 
-    # 检查URL是否已存在
-    existing_repo = db.query(Repository).filter(Repository.github_url == repository.github_url).first()
-    if existing_repo:
-        raise HTTPException(status_code=400, detail="该仓库已存在")
+    result = {"id": db_repository.id, "name": db_repository.name, "github_url": db_repository.github_url}
 
-    db_repository = Repository(
-        name=repository.name,
-        github_url=repository.github_url,
-        owner=owner,
-        repo_name=repo_name,
-        category_id=repository.category_id,
-        description=repository.description.strip()
-    )
-    db.add(db_repository)
-    db.commit()
-    db.refresh(db_repository)
-
-    # 如果启用了自动LLM摘要，入队处理
+    # 如果启用了自动LLM摘要，非阻塞入队；队列已满时仓库照常创建，但告知调用方未入队
     if repository.auto_llm_summary:
-        enqueue_llm_summary(db_repository.id, repository.github_url)
+        claimed, _ = await run_in_threadpool(claim_for_llm_summary, db, [db_repository.id])
+        queued, _ = await enqueue_llm_summary(claimed)
+        result["queued"] = bool(queued)
+        if not queued:
+            result["reason"] = "backlog"
 
-    return {"id": db_repository.id, "name": db_repository.name, "github_url": db_repository.github_url}
+    return result
 
 
 @app.get("/admin", response_class=HTMLResponse)
-async def admin_login_page(request: Request, db: Session = Depends(get_db)):
-    token = request.cookies.get("access_token")
+def admin_login_page(request: Request, db: Session = Depends(get_db)):
+    token = get_access_token(request)
     if token:
         try:
             # 如果已有有效会话，直接进入后台
@@ -656,8 +1023,8 @@ async def admin_login_page(request: Request, db: Session = Depends(get_db)):
 
 
 @app.post("/admin/login")
-async def admin_login(request: Request, username: str = Form(...), password: str = Form(...),
-                      db: Session = Depends(get_db)):
+def admin_login(request: Request, username: str = Form(...), password: str = Form(...),
+                db: Session = Depends(get_db)):
     admin = authenticate_admin(username, password, db)
     if not admin:
         return templates.TemplateResponse("admin_login.html", {
@@ -685,8 +1052,8 @@ async def admin_login(request: Request, username: str = Form(...), password: str
 
 
 @app.get("/admin/dashboard", response_class=HTMLResponse)
-async def admin_dashboard(request: Request, db: Session = Depends(get_db)):
-    token = request.cookies.get("access_token")
+def admin_dashboard(request: Request, db: Session = Depends(get_db)):
+    token = get_access_token(request)
     if not token:
         return RedirectResponse(url="/admin")
 
@@ -696,7 +1063,7 @@ async def admin_dashboard(request: Request, db: Session = Depends(get_db)):
         return RedirectResponse(url="/admin")
 
     categories = db.query(Category).all()
-    repositories = db.query(Repository).order_by(Repository.added_at.desc()).limit(20).all()
+    repositories = db.query(Repository).order_by(Repository.added_at.desc(), Repository.id.desc()).limit(20).all()
 
     return templates.TemplateResponse("admin_dashboard.html", {
         "request": request,
@@ -707,9 +1074,9 @@ async def admin_dashboard(request: Request, db: Session = Depends(get_db)):
 
 
 @app.get("/admin/configs", response_class=HTMLResponse)
-async def admin_configs_page(request: Request, db: Session = Depends(get_db)):
+def admin_configs_page(request: Request, db: Session = Depends(get_db)):
     """配置管理页面"""
-    token = request.cookies.get("access_token")
+    token = get_access_token(request)
     if not token:
         return RedirectResponse(url="/admin")
 
@@ -727,7 +1094,8 @@ async def admin_configs_page(request: Request, db: Session = Depends(get_db)):
 
 
 @app.get("/admin/logout")
-async def admin_logout():
+async def admin_logout(request: Request):
+    invalidate_token(get_access_token(request))
     response = RedirectResponse(url="/admin")
     response.delete_cookie("access_token")
     return response
@@ -735,7 +1103,7 @@ async def admin_logout():
 
 # 管理后台仓库列表（分页与筛选）
 @app.get("/api/admin/repositories")
-async def admin_list_repositories(
+def admin_list_repositories(
         request: Request,
         db: Session = Depends(get_db),
         q: Optional[str] = Query(None),
@@ -743,13 +1111,14 @@ async def admin_list_repositories(
         page: int = Query(1, ge=1),
         page_size: int = Query(20, ge=1, le=100)
 ):
-    token = request.cookies.get("access_token")
+    token = get_access_token(request)
     try:
         _ = get_current_admin(token, db)
     except Exception:
         raise HTTPException(status_code=401, detail="未授权")
 
     query = db.query(Repository)
+    like = None
     if category_id:
         query = query.filter(Repository.category_id == category_id)
     if q:
@@ -762,21 +1131,22 @@ async def admin_list_repositories(
             (Repository.category.has(Category.name.ilike(like)))
         )
 
-    total = query.count()
-    items = query.order_by(Repository.added_at.desc()).offset((page - 1) * page_size).limit(page_size).all()
+    query = query.order_by(Repository.added_at.desc(), Repository.id.desc())
+    items, total, has_more = paginate_repositories(query, page, page_size, (category_id, like))
+    category_map = load_category_map(db)
 
-    return {
-        "items": [repository_to_dict(r) for r in items],
+    return ORJSONResponse({
+        "items": [repository_to_dict(r, category_map) for r in items],
         "total": total,
         "page": page,
         "page_size": page_size,
-        "has_more": (page * page_size) < total
-    }
+        "has_more": has_more
+    })
 
 
 @app.put("/api/repositories/{repository_id}")
-async def update_repository(repository_id: int, repository: RepositoryCreate,
-                            current_admin: Admin = Depends(get_current_admin), db: Session = Depends(get_db)):
+def update_repository(repository_id: int, repository: RepositoryCreate,
+                      current_admin: Admin = Depends(get_current_admin), db: Session = Depends(get_db)):
     db_repository = db.query(Repository).filter(Repository.id == repository_id).first()
     if not db_repository:
         raise HTTPException(status_code=404, detail="仓库不存在")
@@ -786,18 +1156,7 @@ async def update_repository(repository_id: int, repository: RepositoryCreate,
         raise HTTPException(status_code=400, detail="项目描述不能为空")
 
     # 解析GitHub URL
-    try:
-        if "github.com" in repository.github_url:
-            parts = repository.github_url.strip("/").split("/")
-            if len(parts) >= 2:
-                owner = parts[-2]
-                repo_name = parts[-1]
-            else:
-                raise HTTPException(status_code=400, detail="无效的GitHub URL")
-        else:
-            raise HTTPException(status_code=400, detail="请提供有效的GitHub URL")
-    except Exception:
-        raise HTTPException(status_code=400, detail="无效的GitHub URL格式")
+    owner, repo_name = parse_github_url(repository.github_url)
 
     # 检查分类是否存在
     category = db.query(Category).filter(Category.id == repository.category_id).first()
@@ -812,96 +1171,99 @@ async def update_repository(repository_id: int, repository: RepositoryCreate,
     db_repository.description = repository.description.strip()
 
     db.commit()
+    clear_count_cache()
     return {"message": "仓库已更新"}
 
 
 @app.delete("/api/repositories/{repository_id}")
-async def delete_repository(repository_id: int, current_admin: Admin = Depends(get_current_admin),
-                            db: Session = Depends(get_db)):
+def delete_repository(repository_id: int, current_admin: Admin = Depends(get_current_admin),
+                      db: Session = Depends(get_db)):
     repository = db.query(Repository).filter(Repository.id == repository_id).first()
     if not repository:
         raise HTTPException(status_code=404, detail="仓库不存在")
 
     db.delete(repository)
     db.commit()
+    clear_count_cache()
     return {"message": "仓库已删除"}
 
 
 # ========== 配置管理 API ==========
 @app.get("/api/admin/configs")
-async def get_configs(current_admin: Admin = Depends(get_current_admin), db: Session = Depends(get_db)):
+def get_configs(current_admin: Admin = Depends(get_current_admin), db: Session = Depends(get_db)):
     """获取所有配置"""
     configs = db.query(Config).all()
     return [{"key": c.key, "value": c.value, "description": c.description} for c in configs]
 
 
 @app.put("/api/admin/configs")
-async def update_configs(
+def update_configs(
         configs: dict,
         current_admin: Admin = Depends(get_current_admin),
         db: Session = Depends(get_db)
 ):
-    """批量更新配置"""
-    for key, value in configs.items():
-        config = db.query(Config).filter(Config.key == key).first()
-        if config:
-            config.value = value
-        else:
-            new_config = Config(key=key, value=value)
-            db.add(new_config)
-    db.commit()
+    """批量更新配置：一条 INSERT ... ON CONFLICT 语句完成全部新增与更新"""
+    if configs:
+        stmt = sqlite_insert(Config).values([{"key": key, "value": value} for key, value in configs.items()])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Config.key],
+            # ON CONFLICT 分支不会应用列上的 onupdate，这里显式刷新更新时间
+            set_={"value": stmt.excluded.value, "updated_at": func.now()}
+        )
+        db.execute(stmt)
+        db.commit()
+    clear_config_cache()
     return {"message": "配置已更新"}
 
 
 # ========== LLM 摘要 API ==========
+def claim_batch_llm_summary(repository_ids: Optional[List[int]]) -> Tuple[List[Tuple[int, str]], bool]:
+    """认领批量摘要的仓库；未指定仓库ID时，选取描述为空或描述等于仓库地址的仓库"""
+    with SessionLocal() as db:
+        if not repository_ids:
+            repos = db.query(Repository.id, Repository.github_url, Repository.description).filter(
+                Repository.is_processing.is_(False)
+            ).all()
+            repository_ids = [
+                repo.id for repo in repos
+                if not (repo.description or "").strip() or (repo.description or "").strip() == repo.github_url
+            ]
+
+        # 指定了仓库ID时不管描述，直接处理；正在处理中的仓库在认领时排除
+        return claim_for_llm_summary(db, repository_ids, allow_batch=True)
+
+
 @app.post("/api/repositories/batch-llm-summary")
-async def batch_llm_summary(
-        request: Request,
-        db: Session = Depends(get_db)
-):
+async def batch_llm_summary(request: Request):
     """批量为仓库启动异步LLM摘要"""
-    token = request.cookies.get("access_token")
     try:
-        _ = get_current_admin(token, db)
+        await run_in_threadpool(authenticate_token, get_access_token(request))
     except Exception:
         raise HTTPException(status_code=401, detail="未授权")
 
     body = await request.json() if request.headers.get("content-type", "").startswith("application/json") else {}
-    repository_ids = body.get("repository_ids")
 
-    if repository_ids:
-        # 指定了仓库ID：不管描述，直接处理（排除正在处理中的）
-        repos = db.query(Repository).filter(Repository.id.in_(repository_ids)).all()
-        pending = [r for r in repos if r.id not in processing_repositories]
-    else:
-        # 未指定：查找描述为空、或描述等于仓库地址的仓库
-        repos = db.query(Repository).all()
-        pending = []
-        for repo in repos:
-            if repo.id in processing_repositories:
-                continue
-            desc = (repo.description or "").strip()
-            if not desc or desc == repo.github_url:
-                pending.append(repo)
+    repository_ids = body.get("repository_ids")
 
-    for repo in pending:
-        enqueue_llm_summary(repo.id, repo.github_url)
+    # 查询与认领在线程池中执行，入队回到事件循环；
+    # 指定了仓库ID时是管理员要求重新生成，跳过缓存，否则可能原样返回旧摘要
+    claimed, use_batch = await run_in_threadpool(claim_batch_llm_summary, repository_ids)
+    queued, rejected = await enqueue_llm_summary(claimed, use_batch, refresh=bool(repository_ids))
 
-    return {"count": len(pending)}
+    # queue_full 为 True 表示队列已满，部分仓库未能入队
+    return {"count": len(queued), "queue_full": bool(rejected)}
 
 
 @app.post("/api/repositories/generate-summary")
-async def api_generate_summary(
-        data: dict,
-        current_admin: Admin = Depends(get_current_admin),
-        db: Session = Depends(get_db)
-):
-    """生成仓库摘要"""
+async def api_generate_summary(data: dict, request: Request):
+    """生成仓库摘要；认证只短暂占用数据库连接，等待 Jina 与 LLM 期间不持有连接"""
+    await run_in_threadpool(authenticate_token, get_access_token(request))
     github_url = data.get("github_url")
     if not github_url:
         raise HTTPException(status_code=400, detail="缺少 github_url 参数")
 
-    result = await generate_repo_summary(github_url, db)
+    # 管理员手动生成时总是重新获取内容并调用 LLM，不使用缓存的摘要
+    result = await generate_repo_summary(github_url, refresh=True)
     if result["success"]:
         return {"success": True, "summary": result["summary"]}
     else:
@@ -909,4 +1271,12 @@ async def api_generate_summary(
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # 多 worker 需以导入字符串启动；loop/http 为 auto 时在已安装 uvloop/httptools 的环境下自动使用
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", "4")),
+        loop="auto",
+        http="auto"
+    )
@@ -1,8 +1,12 @@
 import hashlib
+import hmac
 import os
+import threading
 from datetime import datetime, timedelta
 from typing import Optional
 
+import bcrypt
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, status, Cookie
 from fastapi.security import HTTPBasic
 from jose import JWTError, jwt
@@ -17,23 +21,53 @@ SECRET_KEY = os.getenv("JWT_SECRET", "vdidDXhbSN")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24小时会话过期时间
 
+# 令牌 -> 管理员（无效令牌为 False）短期缓存：命中时跳过 JWT 解码和数据库查询
+_token_cache: TTLCache = TTLCache(maxsize=1024, ttl=60)
+# 密码校验结果短期缓存：重复登录时不必再付出 bcrypt 计算开销
+_password_cache: TTLCache = TTLCache(maxsize=1024, ttl=60)
+# 同步依赖在线程池中执行，TTLCache 本身不是线程安全的
+_cache_lock = threading.Lock()
+
 
 def hash_password(password: str) -> str:
-    """使用SHA256哈希密码"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """使用bcrypt哈希密码"""
+    return bcrypt.hashpw(password.encode()[:72], bcrypt.gensalt(rounds=12)).decode()
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """是否为需要升级的旧版哈希（bcrypt 哈希以 $2 开头，旧版为无盐SHA256十六进制串）"""
+    return not hashed_password.startswith("$2")
+
+
+def _check_password(plain_password: str, hashed_password: str) -> bool:
+    secret = plain_password.encode()
+    if not needs_rehash(hashed_password):
+        try:
+            return bcrypt.checkpw(secret[:72], hashed_password.encode())
+        except ValueError:
+            return False
+    # 兼容旧版无盐SHA256哈希
+    return hmac.compare_digest(hashlib.sha256(secret).hexdigest(), hashed_password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """验证密码"""
-    return hash_password(plain_password) == hashed_password
+    """验证密码，结果按 (明文摘要, 哈希) 短期缓存"""
+    cache_key = (hashlib.sha256(plain_password.encode()).hexdigest(), hashed_password)
+    with _cache_lock:
+        cached = _password_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    result = _check_password(plain_password, hashed_password)
+    with _cache_lock:
+        _password_cache[cache_key] = result
+    return result
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
+    # 令牌只在登录时签发，每次取一次当前时间即可，无需缓存时间戳
+    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
@@ -66,18 +100,51 @@ def get_current_admin(token: Optional[str] = Cookie(None, alias="access_token"),
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    username = verify_token(token)
-    admin = db.query(Admin).filter(Admin.username == username).first()
-    if admin is None:
+    with _cache_lock:
+        admin = _token_cache.get(token)
+    if admin is False:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="管理员不存在"
+            detail="无效的认证令牌",
+            headers={"WWW-Authenticate": "Bearer"},
         )
+    if admin is not None:
+        return admin
+
+    try:
+        username = verify_token(token)
+        admin = db.query(Admin).filter(Admin.username == username).first()
+        if admin is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="管理员不存在"
+            )
+    except HTTPException:
+        # 无效令牌同样缓存（记为 False），过期 Cookie 反复访问首页时不必重复解码和查询
+        with _cache_lock:
+            _token_cache[token] = False
+        raise
+
+    # 脱离当前会话，避免请求内的 commit 使缓存对象过期
+    db.expunge(admin)
+    with _cache_lock:
+        _token_cache[token] = admin
     return admin
 
 
+def invalidate_token(token: Optional[str]):
+    """使令牌缓存失效（登出时调用）"""
+    if token:
+        with _cache_lock:
+            _token_cache.pop(token, None)
+
+
 def authenticate_admin(username: str, password: str, db: Session):
     admin = db.query(Admin).filter(Admin.username == username).first()
     if not admin or not verify_password(password, admin.password_hash):
         return None
+    # 登录成功时将旧版SHA256哈希升级为bcrypt
+    if needs_rehash(admin.password_hash):
+        admin.password_hash = hash_password(password)
+        db.commit()
     return admin
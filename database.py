@@ -1,13 +1,33 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
 SQLITE_DATABASE_URL = "sqlite:///./github_navigator.db"
 
+# 连接池：接口和后台 LLM 任务并发使用会话，默认 5+10 的池容量在并发下容易排队；
+# LIFO 复用最近归还的连接，让少量热连接保持活跃，多余的溢出连接尽快回收；
+# 适当放大编译缓存（默认 500），接口中的查询形态较多，避免编译结果被频繁淘汰
 engine = create_engine(
-    SQLITE_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLITE_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    query_cache_size=1200,
+    pool_size=20,
+    max_overflow=30,
+    pool_timeout=10,
+    pool_recycle=1800,
+    pool_pre_ping=True,
+    pool_use_lifo=True
 )
 
+
+@event.listens_for(engine, "connect")
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """SQLite 默认不检查外键，每个连接建立时开启"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
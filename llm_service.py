@@ -1,21 +1,265 @@
 """
 LLM 服务模块：使用 OpenAI API 生成仓库摘要
 """
-from typing import Optional
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 
 import httpx
+import orjson
+from cachetools import TTLCache
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
-from models import Config
+from database import SessionLocal
+from models import BatchJob, Config, SummaryCache
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 需要 h2 包（httpx[http2]），未安装时退回 HTTP/1.1
+try:
+    import h2  # noqa: F401
+    HTTP2_ENABLED = True
+except ImportError:
+    HTTP2_ENABLED = False
+
+
+# 共享的 HTTP 客户端：复用连接池中的 keep-alive 连接，避免每次调用都重新进行 TCP/TLS 握手；
+# 启用 HTTP/2 后同一主机的并发请求在一条连接上多路复用
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取共享的 HTTP 客户端，不存在时创建"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=HTTP2_ENABLED,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=300),
+            timeout=httpx.Timeout(60.0, connect=10.0)
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """关闭共享的 HTTP 客户端（应用退出时调用）"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+class ConcurrencyLimiter:
+    """可动态调整上限的并发限制器
+
+    asyncio.Semaphore 创建后无法修改上限，这里用 Condition 保护 active/limit 计数，
+    调大上限时唤醒所有等待者重新检查。
+    """
+
+    def __init__(self, limit: int):
+        self._limit = max(1, limit)
+        self._active = 0
+        self._condition = asyncio.Condition()
+
+    async def set_limit(self, limit: int):
+        limit = max(1, limit)
+        if limit == self._limit:
+            return
+        async with self._condition:
+            self._limit = limit
+            self._condition.notify_all()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._active < self._limit)
+            self._active += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self._active -= 1
+            self._condition.notify(1)
+
+
+class TokenBucket:
+    """令牌桶限速：把突发请求平滑为稳定的每秒请求数，避免触发服务商的 QPS 限制
+
+    桶容量为一秒的令牌数；rate <= 0 表示不限速。
+    """
+
+    def __init__(self, rate: float):
+        self.refill_rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def set_rate(self, rate: float):
+        if rate == self.refill_rate:
+            return
+        self.refill_rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.refill_rate)
+        self.last = now
+
+    async def acquire(self):
+        if self.refill_rate <= 0:
+            return
+        # 等待令牌期间持有锁，后来者按先后顺序排队
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.refill_rate)
+                self._refill()
+            self.tokens -= 1
+
+
+# 外部接口并发上限与每秒请求数，实际值在每次生成摘要时按配置调整
+JINA_LIMITER = ConcurrencyLimiter(16)
+LLM_LIMITER = ConcurrencyLimiter(8)
+JINA_BUCKET = TokenBucket(5)
+LLM_BUCKET = TokenBucket(10)
+
+
+def _to_int(value: str, default: int) -> int:
+    """将配置值转换为整数，无效时使用默认值"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _to_float(value: str, default: float) -> float:
+    """将配置值转换为浮点数，无效时使用默认值"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+# LLM 请求：遇到限流/服务端错误时有限次重试，连接、读、写分别设置超时
+LLM_MAX_ATTEMPTS = 3
+LLM_RETRY_STATUS = {429, 500, 502, 503, 504}
+LLM_TIMEOUT = httpx.Timeout(connect=5.0, read=55.0, write=10.0, pool=5.0)
+# Retry-After 的最长等待时间，避免单次请求延迟无限拉长
+LLM_MAX_RETRY_AFTER = 30.0
+
+
+def _retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    """重试等待时间：优先遵循 Retry-After（秒），否则指数退避 1s、2s、4s…，最多 8s"""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), LLM_MAX_RETRY_AFTER)
+    return min(2.0 ** (attempt - 1), 8.0)
+
+
+# OpenAI Batch API：费用约为实时接口的一半，但结果最长 24 小时内返回，只用于不要求时效的批量摘要；
+# 数量不足 BATCH_MIN_SIZE 的批量任务仍走实时接口
+BATCH_MIN_SIZE = 20
+BATCH_POLL_INTERVAL = 30.0
+BATCH_FINAL_STATUS = {"completed", "failed", "expired", "cancelled"}
+# 轮询连续失败的轮数上限，超过后释放任务，由其他进程或重启后的进程接着轮询
+BATCH_MAX_POLL_FAILURES = 10
+
+
+# 配置读取缓存：配置表很小且很少变化，缓存未命中时一次查询读出全部配置；
+# 修改配置后调用 clear_config_cache 立即失效，TTL 保证多进程部署下其他进程也能在一分钟内读到新值
+_config_cache: TTLCache = TTLCache(maxsize=1, ttl=60)
+_config_cache_lock = threading.Lock()
+
+
+# 预先构造的查询语句，每次执行复用同一语句对象，命中 SQLAlchemy 的编译缓存
+CONFIG_SELECT = select(Config.key, Config.value)
+
+
+def clear_config_cache():
+    """清空配置读取缓存"""
+    with _config_cache_lock:
+        _config_cache.clear()
+
+
+def _load_configs(db: Session) -> dict:
+    """获取全部配置 {key: value}（带缓存）"""
+    with _config_cache_lock:
+        configs = _config_cache.get("configs")
+    if configs is None:
+        configs = {key: value for key, value in db.execute(CONFIG_SELECT).all()}
+        with _config_cache_lock:
+            _config_cache["configs"] = configs
+    return configs
 
 
 def get_config_value(db: Session, key: str, default: str = "") -> str:
     """从数据库获取配置值"""
-    config = db.query(Config).filter(Config.key == key).first()
-    return config.value if config and config.value else default
+    value = _load_configs(db).get(key)
+    return value if value else default
+
+
+def get_config_values(db: Session, keys: List[str], defaults: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """一次取出多个配置值 {key: value}，值为空时使用 defaults 中的默认值"""
+    configs = _load_configs(db)
+    defaults = defaults or {}
+    return {key: configs.get(key) or defaults.get(key, "") for key in keys}
+
 
+def is_batch_enabled(db: Session) -> bool:
+    """是否开启了 OpenAI Batch API 批量摘要"""
+    return get_config_value(db, "openai_batch_enabled", "false").lower() in ("1", "true", "yes", "on")
 
-async def fetch_repo_content_with_jina(github_url: str, jina_api_key: str) -> Optional[str]:
+
+# Jina 返回的仓库内容最多读取 200 KiB；送入 LLM 前再截断到约 8K token 的字符数
+JINA_MAX_BYTES = 200 * 1024
+LLM_MAX_CONTENT_CHARS = 24000
+
+
+# 同一 github_url 的并发 Jina 请求合并为一次，成功获取的内容缓存一小时
+_jina_inflight: Dict[str, asyncio.Future] = {}
+_jina_cache: TTLCache = TTLCache(maxsize=512, ttl=3600)
+
+
+async def fetch_repo_content_with_jina(github_url: str, jina_api_key: str, refresh: bool = False) -> Optional[str]:
+    """获取 GitHub 仓库内容：命中缓存直接返回，已有相同请求在进行时等待其结果
+
+    refresh 为 True 时跳过缓存重新获取（结果仍写回缓存）
+    """
+    content = None if refresh else _jina_cache.get(github_url)
+    if content is not None:
+        return content
+
+    # 检查与登记之间没有 await，单线程事件循环下无需额外加锁
+    future = _jina_inflight.get(github_url)
+    if future is not None:
+        # shield：等待方被取消时不影响发起方和其他等待方
+        return await asyncio.shield(future)
+
+    future = asyncio.get_running_loop().create_future()
+    _jina_inflight[github_url] = future
+    try:
+        content = await _request_jina(github_url, jina_api_key)
+        if content:
+            _jina_cache[github_url] = content
+        future.set_result(content)
+        return content
+    finally:
+        del _jina_inflight[github_url]
+        if not future.done():
+            # 发起方被取消时，让等待方按获取失败处理
+            future.set_result(None)
+
+
+async def _request_jina(github_url: str, jina_api_key: str) -> Optional[str]:
     """使用 Jina.ai Reader API 获取 GitHub 仓库内容"""
     headers = {
         "X-Return-Format": "markdown"
@@ -26,15 +270,25 @@ async def fetch_repo_content_with_jina(github_url: str, jina_api_key: str) -> Op
     try:
         # Jina Reader API
         jina_url = f"https://r.jina.ai/{github_url}"
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(jina_url, headers=headers)
-            if response.status_code == 200:
-                return response.text
-            else:
-                print(f"Jina API 错误: {response.status_code} - {response.text}")
-                return None
+        async with JINA_LIMITER:
+            await JINA_BUCKET.acquire()
+            # 流式读取，超过上限即停止，避免超大仓库文档整体读入内存
+            async with get_http_client().stream("GET", jina_url, headers=headers, timeout=30.0) as response:
+                if response.status_code != 200:
+                    # 日志级别未开启时不读取和解码错误响应体
+                    if logger.isEnabledFor(logging.WARNING):
+                        await response.aread()
+                        logger.warning("Jina API 错误: %s - %s", response.status_code, response.text)
+                    return None
+                buf = bytearray()
+                async for chunk in response.aiter_bytes():
+                    buf += chunk
+                    if len(buf) >= JINA_MAX_BYTES:
+                        break
+        # 截断处可能落在多字节字符中间，忽略不完整的字节
+        return buf[:JINA_MAX_BYTES].decode("utf-8", "ignore")
     except Exception as e:
-        print(f"Jina API 请求失败: {e}")
+        logger.warning("Jina API 请求失败: %s", e)
         return None
 
 
@@ -43,7 +297,8 @@ async def generate_summary_with_llm(
         base_url: str,
         api_key: str,
         model: str,
-        prompt: str
+        prompt: str,
+        max_tokens: int = 500
 ) -> Optional[str]:
     """使用 OpenAI API 生成摘要"""
     if not api_key or not content:
@@ -55,68 +310,498 @@ async def generate_summary_with_llm(
             "Content-Type": "application/json"
         }
 
-        data = {
-            "model": model,
-            "messages": [
-                {"role": "system", "content": "你是一个专业的技术文档分析助手。"},
-                {"role": "user", "content": f"{prompt}\n\n项目内容：\n{content}"}
-            ],
-            "max_tokens": 500
-        }
+        # orjson 序列化/解析比标准库 json 快得多，减少事件循环线程上的 CPU 占用
+        body = orjson.dumps(_build_chat_request(content, model, prompt, max_tokens))
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                f"{base_url.rstrip('/')}/chat/completions",
-                headers=headers,
-                json=data
-            )
+        url = f"{base_url.rstrip('/')}/chat/completions"
+        for attempt in range(1, LLM_MAX_ATTEMPTS + 1):
+            try:
+                async with LLM_LIMITER:
+                    await LLM_BUCKET.acquire()
+                    response = await get_http_client().post(url, headers=headers, content=body, timeout=LLM_TIMEOUT)
+            except httpx.TransportError as e:
+                # 连接失败、超时等传输层错误
+                if attempt == LLM_MAX_ATTEMPTS:
+                    raise
+                logger.warning("LLM API 请求失败，第 %s 次重试: %s", attempt, e)
+                await asyncio.sleep(_retry_delay(attempt))
+                continue
+            if response.status_code in LLM_RETRY_STATUS and attempt < LLM_MAX_ATTEMPTS:
+                logger.warning("OpenAI API 返回 %s，第 %s 次重试", response.status_code, attempt)
+                await asyncio.sleep(_retry_delay(attempt, response))
+                continue
+            break
 
-            if response.status_code == 200:
-                result = response.json()
-                summary = result.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
-                if not summary:
-                    print('LLM 返回内容为空：', result)
-                return summary
-            else:
-                print(f"OpenAI API 错误: {response.status_code} - {response.text}")
-                return None
+        if response.status_code == 200:
+            return _parse_chat_response(orjson.loads(response.content))
+        else:
+            if logger.isEnabledFor(logging.WARNING):
+                logger.warning("OpenAI API 错误: %s - %s", response.status_code, response.text)
+            return None
     except Exception as e:
-        print(f"LLM API 请求失败: {e}")
+        logger.warning("LLM API 请求失败: %s", e)
         return None
 
 
-async def generate_repo_summary(github_url: str, db: Session) -> dict:
+def _build_chat_request(content: str, model: str, prompt: str, max_tokens: int) -> dict:
+    """构造 chat/completions 请求体（实时接口与 Batch API 共用）"""
+    # 提示词与项目内容分为两条用户消息，避免为拼接再复制一份完整的项目内容
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": "你是一个专业的技术文档分析助手。"},
+            {"role": "user", "content": prompt},
+            {"role": "user", "content": content[:LLM_MAX_CONTENT_CHARS]}
+        ],
+        "max_tokens": max_tokens
+    }
+
+
+def _parse_chat_response(result: dict) -> str:
+    """从 chat/completions 响应中取出摘要文本"""
+    summary = result.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
+    if not summary:
+        logger.warning("LLM 返回内容为空: %s", result)
+    return summary
+
+
+# 生成摘要用到的配置项及默认值
+SUMMARY_CONFIG_KEYS = [
+    "jina_api_key", "openai_base_url", "openai_api_key", "openai_model", "openai_prompt", "openai_max_tokens",
+    "jina_concurrency", "openai_concurrency", "jina_rps", "openai_rps",
+]
+SUMMARY_CONFIG_DEFAULTS = {
+    "openai_base_url": "https://api.openai.com/v1",
+    "openai_model": "gpt-4o-mini",
+    "openai_prompt": "请用中文总结这个GitHub项目的主要功能和特点，限制在200字以内。",
+}
+
+
+def _read_summary_configs(db: Optional[Session]) -> Dict[str, str]:
+    """读取摘要相关配置（同步数据库操作）；未传入 db 时只在读取期间使用短期会话"""
+    with nullcontext(db) if db is not None else SessionLocal() as session:
+        return get_config_values(session, SUMMARY_CONFIG_KEYS, SUMMARY_CONFIG_DEFAULTS)
+
+
+async def _load_summary_settings(db: Optional[Session]) -> dict:
+    """读取摘要相关配置，并按配置调整并发与限速
+
+    配置缓存未命中时需要查询数据库，放到线程中执行，不阻塞事件循环
+    """
+    configs = await asyncio.to_thread(_read_summary_configs, db)
+
+    await JINA_LIMITER.set_limit(_to_int(configs["jina_concurrency"], 16))
+    await LLM_LIMITER.set_limit(_to_int(configs["openai_concurrency"], 8))
+    JINA_BUCKET.set_rate(_to_float(configs["jina_rps"], 5))
+    LLM_BUCKET.set_rate(_to_float(configs["openai_rps"], 10))
+    return {
+        "jina_api_key": configs["jina_api_key"],
+        "base_url": configs["openai_base_url"],
+        "api_key": configs["openai_api_key"],
+        "model": configs["openai_model"],
+        "prompt": configs["openai_prompt"],
+        "max_tokens": _to_int(configs["openai_max_tokens"], 500),
+    }
+
+
+async def _fetch_content(github_url: str, jina_api_key: str, refresh: bool = False) -> str:
+    """获取仓库内容，Jina 失败时退回为仓库地址"""
+    content = await fetch_repo_content_with_jina(github_url, jina_api_key, refresh)
+    return content or f"GitHub 仓库地址: {github_url}"
+
+
+def summary_cache_key(content: str, model: str, prompt: str) -> str:
+    """摘要缓存键：按实际送入模型的内容计算哈希"""
+    content_hash = hashlib.blake2b(content[:LLM_MAX_CONTENT_CHARS].encode(), digest_size=32).hexdigest()
+    prompt_hash = hashlib.blake2b(prompt.encode(), digest_size=8).hexdigest()
+    return f"{content_hash}:{model}:{prompt_hash}"
+
+
+# 摘要缓存有效期；过期记录不再命中，写入时顺带清理（每小时最多一次）
+SUMMARY_CACHE_TTL = timedelta(days=30)
+SUMMARY_CACHE_PRUNE_INTERVAL = 3600
+_summary_cache_pruned_at: Optional[float] = None
+
+
+def _get_cached_summaries(keys: List[str]) -> Dict[str, str]:
+    """批量查询摘要缓存，返回命中且未过期的 {key: 摘要}
+
+    与 _save_cached_summaries 一样是同步数据库操作，异步函数中需经 asyncio.to_thread 调用
+    """
+    if not keys:
+        return {}
+    try:
+        with SessionLocal() as session:
+            rows = session.execute(
+                select(SummaryCache.key, SummaryCache.summary).where(
+                    SummaryCache.key.in_(keys),
+                    SummaryCache.created_at >= datetime.utcnow() - SUMMARY_CACHE_TTL
+                )
+            ).all()
+        return {key: summary for key, summary in rows}
+    except Exception as e:
+        logger.warning("读取摘要缓存失败: %s", e)
+        return {}
+
+
+def _save_cached_summaries(summaries: Dict[str, str]):
+    """写入摘要缓存，已存在的键覆盖为新摘要并重新计算有效期；写入失败不影响摘要结果"""
+    global _summary_cache_pruned_at
+    if not summaries:
+        return
+    try:
+        with SessionLocal() as session:
+            stmt = sqlite_insert(SummaryCache).values(
+                [{"key": key, "summary": summary} for key, summary in summaries.items()]
+            )
+            session.execute(stmt.on_conflict_do_update(
+                index_elements=["key"],
+                set_={"summary": stmt.excluded.summary, "created_at": func.now()}
+            ))
+            if (_summary_cache_pruned_at is None
+                    or time.monotonic() - _summary_cache_pruned_at > SUMMARY_CACHE_PRUNE_INTERVAL):
+                _summary_cache_pruned_at = time.monotonic()
+                session.execute(
+                    delete(SummaryCache).where(SummaryCache.created_at < datetime.utcnow() - SUMMARY_CACHE_TTL)
+                )
+            session.commit()
+    except Exception as e:
+        logger.warning("写入摘要缓存失败: %s", e)
+
+
+async def generate_repo_summary(github_url: str, db: Optional[Session] = None, refresh: bool = False) -> dict:
     """
     生成仓库摘要的主函数
+    refresh 为 True 时（管理员手动重新生成）跳过仓库内容与摘要缓存，新结果仍写入缓存
     返回: {"success": bool, "summary": str, "error": str}
     """
-    # 获取配置
-    jina_api_key = get_config_value(db, "jina_api_key")
-    openai_base_url = get_config_value(db, "openai_base_url", "https://api.openai.com/v1")
-    openai_api_key = get_config_value(db, "openai_api_key")
-    openai_model = get_config_value(db, "openai_model", "gpt-4o-mini")
-    openai_prompt = get_config_value(db, "openai_prompt", "请用中文总结这个GitHub项目的主要功能和特点，限制在200字以内。")
+    settings = await _load_summary_settings(db)
 
     # 检查必要配置
-    if not openai_api_key:
+    if not settings["api_key"]:
         return {"success": False, "summary": "", "error": "未配置 OpenAI API Key"}
 
     # 1. 使用 Jina 获取仓库内容
-    content = await fetch_repo_content_with_jina(github_url, jina_api_key)
-    if not content:
-        # 如果 Jina 失败，尝试直接使用 GitHub URL
-        content = f"GitHub 仓库地址: {github_url}"
+    content = await _fetch_content(github_url, settings["jina_api_key"], refresh)
+
+    # 2. 内容、模型和提示词都未变化时直接使用缓存的摘要
+    cache_key = summary_cache_key(content, settings["model"], settings["prompt"])
+    if not refresh:
+        summary = (await asyncio.to_thread(_get_cached_summaries, [cache_key])).get(cache_key)
+        if summary:
+            return {"success": True, "summary": summary, "error": ""}
 
-    # 2. 使用 LLM 生成摘要
+    # 3. 使用 LLM 生成摘要
     summary = await generate_summary_with_llm(
         content,
-        openai_base_url,
-        openai_api_key,
-        openai_model,
-        openai_prompt
+        settings["base_url"],
+        settings["api_key"],
+        settings["model"],
+        settings["prompt"],
+        settings["max_tokens"]
     )
 
     if summary:
+        await asyncio.to_thread(_save_cached_summaries, {cache_key: summary})
         return {"success": True, "summary": summary, "error": ""}
     else:
         return {"success": False, "summary": "", "error": "生成摘要失败"}
+
+
+def _save_batch_job(batch_id: str, base_url: str, request_keys: List[str], url_keys: Dict[str, str],
+                    owner: Optional[str]):
+    """记录已提交的 Batch 任务，进程重启后可据此继续轮询"""
+    try:
+        with SessionLocal() as session:
+            session.add(BatchJob(
+                batch_id=batch_id, base_url=base_url,
+                request_keys=orjson.dumps(request_keys).decode(), url_keys=orjson.dumps(url_keys).decode(),
+                processing_owner=owner, processing_heartbeat=func.now()
+            ))
+            session.commit()
+    except Exception as e:
+        logger.warning("记录 OpenAI Batch 任务 %s 失败: %s", batch_id, e)
+
+
+def _load_batch_job(batch_id: str) -> Optional[Tuple[str, List[str], Dict[str, str]]]:
+    """读取 Batch 任务记录，返回 (base_url, request_keys, url_keys)"""
+    with SessionLocal() as session:
+        job = session.get(BatchJob, batch_id)
+        if job is None:
+            return None
+        return job.base_url, orjson.loads(job.request_keys), orjson.loads(job.url_keys)
+
+
+def _finish_batch_job(batch_id: str, release: bool):
+    """结束对 Batch 任务的处理：release 为 True 时只释放认领，由其他进程或重启后的进程接着轮询；否则删除记录"""
+    try:
+        with SessionLocal() as session:
+            if release:
+                session.execute(
+                    update(BatchJob).where(BatchJob.batch_id == batch_id)
+                    .values(processing_owner=None, processing_heartbeat=None)
+                )
+            else:
+                session.execute(delete(BatchJob).where(BatchJob.batch_id == batch_id))
+            session.commit()
+    except Exception as e:
+        logger.warning("更新 OpenAI Batch 任务 %s 记录失败: %s", batch_id, e)
+
+
+async def _get_with_retry(url: str, headers: dict) -> httpx.Response:
+    """GET 请求（轮询 Batch 状态、下载输出文件），限流、服务端错误和传输层错误按 LLM 请求的规则重试"""
+    for attempt in range(1, LLM_MAX_ATTEMPTS + 1):
+        try:
+            response = await get_http_client().get(url, headers=headers, timeout=LLM_TIMEOUT)
+        except httpx.TransportError as e:
+            if attempt == LLM_MAX_ATTEMPTS:
+                raise
+            logger.warning("OpenAI Batch 请求失败，第 %s 次重试: %s", attempt, e)
+            await asyncio.sleep(_retry_delay(attempt))
+            continue
+        if response.status_code in LLM_RETRY_STATUS and attempt < LLM_MAX_ATTEMPTS:
+            logger.warning("OpenAI Batch 接口返回 %s，第 %s 次重试", response.status_code, attempt)
+            await asyncio.sleep(_retry_delay(attempt, response))
+            continue
+        response.raise_for_status()
+        return response
+
+
+def _is_transient_error(error: BaseException) -> bool:
+    """传输层错误及限流、服务端错误视为暂时性故障"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in LLM_RETRY_STATUS
+    return isinstance(error, httpx.TransportError)
+
+
+async def _submit_openai_batch(base_url: str, api_key: str, requests: List[dict]) -> str:
+    """上传输入文件并创建 Batch 任务，返回任务 ID
+
+    requests 中每项为 {"custom_id": str, "body": chat/completions 请求体}
+    """
+    client = get_http_client()
+    base_url = base_url.rstrip("/")
+    headers = {"Authorization": f"Bearer {api_key}"}
+
+    # 1. 上传 JSONL 输入文件
+    lines = [
+        orjson.dumps({"custom_id": item["custom_id"], "method": "POST", "url": "/v1/chat/completions",
+                      "body": item["body"]})
+        for item in requests
+    ]
+    payload = b"\n".join(lines)
+    response = await client.post(
+        f"{base_url}/files", headers=headers, data={"purpose": "batch"},
+        files={"file": ("batch.jsonl", payload, "application/jsonl")}, timeout=LLM_TIMEOUT
+    )
+    response.raise_for_status()
+    input_file_id = response.json()["id"]
+
+    # 2. 创建 Batch 任务
+    response = await client.post(
+        f"{base_url}/batches", headers=headers,
+        json={"input_file_id": input_file_id, "endpoint": "/v1/chat/completions", "completion_window": "24h"},
+        timeout=LLM_TIMEOUT
+    )
+    response.raise_for_status()
+    batch_id = response.json()["id"]
+    logger.info("已提交 OpenAI Batch 任务 %s，共 %s 条", batch_id, len(requests))
+    return batch_id
+
+
+async def _wait_openai_batch(base_url: str, api_key: str, batch_id: str) -> Dict[str, str]:
+    """轮询 Batch 任务直到结束，返回 {custom_id: 摘要}；失败的条目不出现在结果中
+
+    单次轮询的暂时性故障在 _get_with_retry 中重试，仍失败时等到下一轮继续，
+    连续 BATCH_MAX_POLL_FAILURES 轮失败才抛出
+    """
+    base_url = base_url.rstrip("/")
+    headers = {"Authorization": f"Bearer {api_key}"}
+
+    # 3. 轮询直到任务结束
+    failures = 0
+    while True:
+        try:
+            batch = (await _get_with_retry(f"{base_url}/batches/{batch_id}", headers)).json()
+        except httpx.HTTPError as e:
+            failures += 1
+            if not _is_transient_error(e) or failures >= BATCH_MAX_POLL_FAILURES:
+                raise
+            logger.warning("轮询 OpenAI Batch 任务 %s 失败（连续 %s 次）: %s", batch_id, failures, e)
+        else:
+            if batch.get("status") in BATCH_FINAL_STATUS:
+                break
+            failures = 0
+        await asyncio.sleep(BATCH_POLL_INTERVAL)
+
+    output_file_id = batch.get("output_file_id")
+    if not output_file_id:
+        logger.warning("OpenAI Batch 任务 %s 结束，状态 %s，无输出文件", batch_id, batch.get("status"))
+        return {}
+
+    # 4. 下载并解析输出文件
+    response = await _get_with_retry(f"{base_url}/files/{output_file_id}/content", headers)
+    summaries = {}
+    for line in response.content.splitlines():
+        if not line.strip():
+            continue
+        item = orjson.loads(line)
+        result = item.get("response") or {}
+        if result.get("status_code") == 200:
+            summary = _parse_chat_response(result.get("body") or {})
+            if summary:
+                summaries[item["custom_id"]] = summary
+    return summaries
+
+
+async def _collect_openai_batch(base_url: str, api_key: str, batch_id: str,
+                                request_keys: List[str]) -> Dict[str, str]:
+    """等待 Batch 任务结束并写入摘要缓存，返回 {缓存键: 摘要}
+
+    结果写入缓存后删除任务记录；暂时性故障或进程退出时只释放认领，任务由其他进程接着轮询，不会重新提交
+    """
+    try:
+        results = await _wait_openai_batch(base_url, api_key, batch_id)
+    except BaseException as e:
+        release = isinstance(e, asyncio.CancelledError) or _is_transient_error(e)
+        await asyncio.to_thread(_finish_batch_job, batch_id, release)
+        raise
+    generated = {request_keys[int(custom_id)]: summary for custom_id, summary in results.items()}
+    await asyncio.to_thread(_save_cached_summaries, generated)
+    await asyncio.to_thread(_finish_batch_job, batch_id, False)
+    return generated
+
+
+def _batch_results(url_keys: Dict[str, str], summaries: Dict[str, str]) -> Dict[str, dict]:
+    """按缓存键将摘要对应回各仓库地址"""
+    results = {}
+    for url, cache_key in url_keys.items():
+        summary = summaries.get(cache_key)
+        if summary:
+            results[url] = {"success": True, "summary": summary, "error": ""}
+        else:
+            results[url] = {"success": False, "summary": "", "error": "生成摘要失败"}
+    return results
+
+
+async def generate_repo_summaries_with_batch(github_urls: List[str], db: Optional[Session] = None,
+                                             refresh: bool = False, job_owner: Optional[str] = None) -> Dict[str, dict]:
+    """
+    通过 OpenAI Batch API 批量生成仓库摘要，仓库内容仍实时从 Jina 获取
+    refresh 为 True 时跳过仓库内容与摘要缓存，全部重新提交，新结果仍写入缓存
+    提交后的任务记录在 batch_jobs 表中（认领者为 job_owner），进程重启后由 resume_repo_summaries_batch 继续
+    返回: {github_url: {"success": bool, "summary": str, "error": str}}
+    """
+    settings = await _load_summary_settings(db)
+    if not settings["api_key"]:
+        return {url: {"success": False, "summary": "", "error": "未配置 OpenAI API Key"} for url in github_urls}
+
+    contents = await asyncio.gather(*[_fetch_content(url, settings["jina_api_key"], refresh) for url in github_urls])
+    cache_keys = [summary_cache_key(content, settings["model"], settings["prompt"]) for content in contents]
+    url_keys = dict(zip(github_urls, cache_keys))
+    cached = {} if refresh else await asyncio.to_thread(_get_cached_summaries, cache_keys)
+    # 只提交未命中缓存的仓库；内容相同的仓库只提交一次
+    pending = {key: content for key, content in zip(cache_keys, contents) if key not in cached}
+    pending_keys = list(pending)
+    requests = [
+        {
+            "custom_id": str(index),
+            "body": _build_chat_request(pending[key], settings["model"], settings["prompt"], settings["max_tokens"])
+        }
+        for index, key in enumerate(pending_keys)
+    ]
+
+    summaries = dict(cached)
+    if requests:
+        try:
+            batch_id = await _submit_openai_batch(settings["base_url"], settings["api_key"], requests)
+            await asyncio.to_thread(_save_batch_job, batch_id, settings["base_url"], pending_keys, url_keys, job_owner)
+            summaries.update(await _collect_openai_batch(settings["base_url"], settings["api_key"], batch_id,
+                                                         pending_keys))
+        except Exception as e:
+            logger.warning("OpenAI Batch 请求失败: %s", e)
+    return _batch_results(url_keys, summaries)
+
+
+async def resume_repo_summaries_batch(batch_id: str, db: Optional[Session] = None) -> Dict[str, dict]:
+    """继续轮询进程重启前已提交的 Batch 任务，返回值同 generate_repo_summaries_with_batch"""
+    job = await asyncio.to_thread(_load_batch_job, batch_id)
+    if job is None:
+        return {}
+    base_url, request_keys, url_keys = job
+    settings = await _load_summary_settings(db)
+    logger.info("继续轮询 OpenAI Batch 任务 %s", batch_id)
+    summaries = {}
+    try:
+        summaries = await _collect_openai_batch(base_url, settings["api_key"], batch_id, request_keys)
+    except Exception as e:
+        logger.warning("OpenAI Batch 请求失败: %s", e)
+    # 提交时已命中缓存的仓库从缓存中读取
+    missing = [key for key in set(url_keys.values()) if key not in summaries]
+    summaries.update(await asyncio.to_thread(_get_cached_summaries, missing))
+    return _batch_results(url_keys, summaries)
+
+
+def _read_checkpoint(output_jsonl: str) -> Dict[str, str]:
+    """读取检查点文件中已完成的 {github_url: 摘要}；进程中断时写了一半的末行直接忽略"""
+    done = {}
+    if not os.path.exists(output_jsonl):
+        return done
+    with open(output_jsonl, "rb") as f:
+        for line in f:
+            try:
+                record = orjson.loads(line)
+                done[record["url"]] = record["summary"]
+            except (orjson.JSONDecodeError, KeyError, TypeError):
+                # 不完整或缺少字段的记录视为未完成
+                continue
+    return done
+
+
+async def generate_repo_summaries_with_checkpoint(
+        github_urls: List[str],
+        output_jsonl: str,
+        db: Optional[Session] = None,
+        concurrency: int = 8
+) -> Dict[str, dict]:
+    """
+    批量生成仓库摘要，每个成功结果立即追加写入 JSONL 检查点文件并落盘；
+    中断后用同一文件重新运行，文件中已有的仓库直接跳过，不会重复调用 Jina 和 LLM
+    返回: {github_url: {"success": bool, "summary": str, "error": str}}
+    """
+    done = _read_checkpoint(output_jsonl)
+    results = {url: {"success": True, "summary": done[url], "error": ""} for url in github_urls if url in done}
+    pending = [url for url in dict.fromkeys(github_urls) if url not in done]
+    if not pending:
+        return results
+
+    # 先用调用方的会话读取一次配置填充配置缓存；各仓库并发执行时不再共用该会话（会话不是线程安全的）
+    await _load_summary_settings(db)
+    semaphore = asyncio.Semaphore(concurrency)
+    with open(output_jsonl, "a+b") as f:
+        # 上次中断时末行可能不完整，先补换行，避免与新记录粘连
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+        async def run(url: str):
+            # 单个仓库出错只记为失败，不能中断 gather：否则文件随 with 块关闭，其余仓库的结果无法写入
+            try:
+                async with semaphore:
+                    result = await generate_repo_summary(url)
+            except Exception as e:
+                logger.warning("仓库 %s 摘要生成出错: %s", url, e)
+                result = {"success": False, "summary": "", "error": str(e)}
+            results[url] = result
+            if result["success"]:
+                # 写入在两次 await 之间完成，协程之间不会交错
+                f.write(orjson.dumps({"url": url, "summary": result["summary"]}) + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+        await asyncio.gather(*[run(url) for url in pending])
+
+    logger.info("批量摘要完成，新生成 %s 个，跳过已完成 %s 个",
+                sum(1 for url in pending if results[url]["success"]), len(github_urls) - len(pending))
+    return results
@@ -1,20 +1,29 @@
 import os
-from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Index, false, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
 Base = declarative_base()
 
+# 时间戳列使用 func.now()：INSERT/UPDATE 语句内联 CURRENT_TIMESTAMP（UTC），不必在 Python 中逐行生成时间并绑定参数；
+# server_default 只对新建的表生效，保留 default 使已有表同样适用
+
+# GitHub 仓库地址最大长度（用户名最长 39 字符、仓库名最长 100 字符，200 足够）
+GITHUB_URL_MAX_LENGTH = 200
+
+# 卡片服务地址在模块加载时读取一次，序列化仓库列表时不再逐条读取环境变量
+GITCARD_BASE_URL = os.getenv('GITCARD_BASE_URL')
+
 
 class Admin(Base):
     __tablename__ = "admins"
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(50), unique=True, index=True, nullable=False)
-    password_hash = Column(String(255), nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # bcrypt 哈希为 60 字符，尚未升级的旧版 SHA256 十六进制哈希为 64 字符
+    password_hash = Column(String(64), nullable=False)
+    created_at = Column(DateTime, default=func.now(), server_default=func.now())
 
 
 class Category(Base):
@@ -22,26 +31,40 @@ class Category(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
-    parent_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
+    parent_id = Column(Integer, ForeignKey("categories.id"), nullable=True, index=True)
     level = Column(Integer, default=0)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=func.now(), server_default=func.now())
 
-    parent = relationship("Category", remote_side=[id])
+    # 关系保持懒加载：分类树接口一次查出全部分类后按 parent_id 分组，仓库在查询中显式 selectinload；
+    # 在模型上设置 selectin 会让每次分类查询（包括扁平列表、首页）都额外执行用不到的查询
+    parent = relationship("Category", remote_side=[id], back_populates="children")
     children = relationship("Category", back_populates="parent")
     repositories = relationship("Repository", back_populates="category")
 
 
 class Repository(Base):
     __tablename__ = "repositories"
+    __table_args__ = (
+        # 列表按入库时间倒序、按分类筛选
+        Index("ix_repo_added_at", "added_at"),
+        Index("ix_repo_category_id", "category_id"),
+        # 按 owner/repo_name 定位仓库（card_url 由这两列组成）
+        Index("ix_repo_owner_name", "owner", "repo_name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), nullable=False)
-    github_url = Column(String(300), unique=True, nullable=False)
+    github_url = Column(String(GITHUB_URL_MAX_LENGTH), unique=True, nullable=False)
     owner = Column(String(100), nullable=False)
     repo_name = Column(String(100), nullable=False)
     description = Column(Text, nullable=True)
     updated_at = Column(DateTime)
-    added_at = Column(DateTime, default=datetime.utcnow)
+    added_at = Column(DateTime, default=func.now(), server_default=func.now())
+    # 是否正在生成 LLM 摘要，存数据库以便多进程部署下状态一致
+    is_processing = Column(Boolean, nullable=False, default=False, server_default=false())
+    # 认领该仓库的进程标识及其最近一次心跳；心跳过期说明进程已退出，标记可以安全重置
+    processing_owner = Column(String(32), nullable=True)
+    processing_heartbeat = Column(DateTime, nullable=True)
 
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
     category = relationship("Category", back_populates="repositories")
@@ -49,8 +72,7 @@ class Repository(Base):
     @property
     def card_url(self):
         """生成 GitHub 信息卡片 URL"""
-        gitcard_base_url = os.getenv('GITCARD_BASE_URL')
-        return f"{gitcard_base_url}/github/{self.owner}/{self.repo_name}"
+        return f"{GITCARD_BASE_URL}/github/{self.owner}/{self.repo_name}"
 
 
 class Config(Base):
@@ -60,4 +82,32 @@ class Config(Base):
     key = Column(String(100), unique=True, nullable=False, index=True)
     value = Column(Text, nullable=True)
     description = Column(String(255), nullable=True)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=func.now(), server_default=func.now(), onupdate=func.now())
+
+
+class SummaryCache(Base):
+    """LLM 摘要缓存，键为 内容哈希:模型:提示词哈希，仓库内容未变时直接复用摘要"""
+    __tablename__ = "summary_cache"
+    __table_args__ = (
+        # 按创建时间判断过期并清理
+        Index("ix_summary_cache_created_at", "created_at"),
+    )
+
+    key = Column(String(200), primary_key=True)
+    summary = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=func.now(), server_default=func.now())
+
+
+class BatchJob(Base):
+    """已提交、尚未取回结果的 OpenAI Batch 任务；进程重启后据此继续轮询，而不是重新提交"""
+    __tablename__ = "batch_jobs"
+
+    batch_id = Column(String(100), primary_key=True)
+    base_url = Column(String(255), nullable=False)
+    # JSON：custom_id（下标）对应的摘要缓存键列表，以及 {github_url: 摘要缓存键}
+    request_keys = Column(Text, nullable=False)
+    url_keys = Column(Text, nullable=False)
+    # 负责轮询该任务的进程标识及其心跳，过期规则与 Repository 的认领相同
+    processing_owner = Column(String(32), nullable=True)
+    processing_heartbeat = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=func.now(), server_default=func.now())
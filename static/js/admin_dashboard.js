@@ -1065,8 +1065,10 @@ document.addEventListener('DOMContentLoaded', () => {
             if (!res.ok) throw new Error('请求失败');
             const data = await res.json();
             if (data.count > 0) {
-                alert(`已将 ${data.count} 个仓库放入异步LLM摘要队列`);
+                alert(`已将 ${data.count} 个仓库放入异步LLM摘要队列` + (data.queue_full ? '（队列已满，其余仓库请稍后重试）' : ''));
                 loadRepos();
+            } else if (data.queue_full) {
+                alert('LLM摘要队列已满，请稍后重试');
             } else {
                 alert('没有需要进行LLM摘要的仓库');
             }